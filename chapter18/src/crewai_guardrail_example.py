@@ -4,6 +4,8 @@
 # See the LICENSE file in the repository for the full license text.
 
 import os
+import sys
+import re
 import json
 import logging
 from typing import Tuple, Any, List
@@ -93,6 +95,9 @@ class PolicyEvaluation(BaseModel):
     evaluation_summary: str = Field(description="A brief explanation for the compliance status.")
     triggered_policies: List[str] = Field(description="A list of triggered policy directives, if any.")
 
+# Matches an optional markdown code block (with or without a "json" tag) around the LLM's output.
+CODE_FENCE_PATTERN = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+
 # --- Output Validation Guardrail Function ---
 def validate_policy_evaluation(output: Any) -> Tuple[bool, Any]:
     """
@@ -113,10 +118,9 @@ def validate_policy_evaluation(output: Any) -> Tuple[bool, Any]:
         elif isinstance(output, str):
             logging.info("Guardrail received string output, attempting to parse.")
             # Clean up potential markdown code blocks from the LLM's output
-            if output.startswith("```json") and output.endswith("```"):
-                output = output[len("```json"): -len("```")].strip()
-            elif output.startswith("```") and output.endswith("```"):
-                output = output[len("```"): -len("```")].strip()
+            fence_match = CODE_FENCE_PATTERN.match(output)
+            if fence_match:
+                output = fence_match.group(1)
 
             data = json.loads(output)
             evaluation = PolicyEvaluation.model_validate(data)
@@ -211,25 +215,27 @@ def run_guardrail_crew(user_input: str) -> Tuple[bool, str, List[str]]:
         return False, f"An internal error occurred during policy check: {e}", []
 
 def print_test_case_result(test_number: int, user_input: str, is_compliant: bool, message: str, triggered_policies: List[str]):
-    """Formats and prints the result of a single test case."""
-    print("=" * 60)
-    print(f"📋 TEST CASE {test_number}: EVALUATING INPUT")
-    print(f"Input: '{user_input}'")
-    print("-" * 60)
-    
+    """Formats the result of a single test case and writes it to stdout in one call."""
+    lines = [
+        "=" * 60,
+        f"📋 TEST CASE {test_number}: EVALUATING INPUT",
+        f"Input: '{user_input}'",
+        "-" * 60,
+    ]
+
     if is_compliant:
-        print("✅ RESULT: COMPLIANT")
-        print(f"   Summary: {message}")
-        print("   Action: Primary AI can safely proceed with this input.")
+        lines.append("✅ RESULT: COMPLIANT")
+        lines.append(f"   Summary: {message}")
+        lines.append("   Action: Primary AI can safely proceed with this input.")
     else:
-        print("❌ RESULT: NON-COMPLIANT")
-        print(f"   Summary: {message}")
+        lines.append("❌ RESULT: NON-COMPLIANT")
+        lines.append(f"   Summary: {message}")
         if triggered_policies:
-            print("   Triggered Policies:")
-            for policy in triggered_policies:
-                print(f"     - {policy}")
-        print("   Action: Input blocked. Primary AI will not process this request.")
-    print("=" * 60 + "\n")
+            lines.append("   Triggered Policies:")
+            lines.extend(f"     - {policy}" for policy in triggered_policies)
+        lines.append("   Action: Input blocked. Primary AI will not process this request.")
+    lines.append("=" * 60 + "\n")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 if __name__ == "__main__":
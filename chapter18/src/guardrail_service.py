@@ -0,0 +1,38 @@
+# Copyright (c) 2025 Marco Fago
+#
+# This code is licensed under the MIT License.
+# See the LICENSE file in the repository for the full license text.
+
+from typing import List
+
+from fastapi import FastAPI
+from pydantic import BaseModel, Field
+
+# Importing the example configures the Gemini client and creates the policy enforcer
+# model once per worker process. The model, its gRPC channel and the decision caches
+# then stay warm across requests instead of being rebuilt for every run.
+from llm_guardrail_example import analyze_input_with_policy_enforcer
+
+# --- Request and Response Models ---
+class GuardrailCheckRequest(BaseModel):
+    """The input to be screened by the guardrail."""
+    input: str = Field(description="The user input intended for the primary AI system.")
+
+class GuardrailCheckResponse(BaseModel):
+    """The guardrail's decision for a single input."""
+    is_compliant: bool = Field(description="Whether the primary AI may process the input.")
+    evaluation_summary: str = Field(description="A brief explanation for the compliance status.")
+    triggered_policies: List[str] = Field(description="A list of triggered policy directives, if any.")
+
+# --- Service ---
+app = FastAPI(title="LLM-based Content Policy Enforcer")
+
+@app.post("/guardrail/check", response_model=GuardrailCheckResponse)
+async def check_input(request: GuardrailCheckRequest) -> GuardrailCheckResponse:
+    """Screens a single input against the safety policies."""
+    is_compliant, message, triggered_policies = await analyze_input_with_policy_enforcer(request.input)
+    return GuardrailCheckResponse(
+        is_compliant=is_compliant,
+        evaluation_summary=message,
+        triggered_policies=triggered_policies,
+    )